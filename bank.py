@@ -1,6 +1,101 @@
 import logging
-import random as rand
+import math
+from array import array
+import numpy as np
 import simpy as sim
+from simpy.events import AnyOf
+
+
+# Журнал моделирования.
+# Сообщения передаются в %-формате, чтобы строка
+# форматировалась только при включённом уровне INFO
+_LOG = logging.getLogger(__name__)
+# Функция записи сообщений уровня INFO в журнал.
+# Заменяется на _log_nothing, если уровень INFO отключён
+# (см. настройку логирования в глобальной области)
+_log_info = _LOG.info
+
+
+def _log_nothing(*args, **kwargs):
+    pass
+
+
+class BufferedFileHandler(logging.StreamHandler):
+    """Обработчик журнала, пишущий в файл с большим буфером.
+
+    В отличие от `logging.FileHandler`, не сбрасывает буфер
+    на диск после каждой записи: данные записываются по мере
+    заполнения буфера и при закрытии обработчика
+    (`logging` закрывает обработчики при завершении программы).
+    """
+
+    def __init__(self, filename: str, buffering: int = 1 << 20):
+        super().__init__(
+            open(filename, "w", buffering=buffering, encoding="utf-8")
+        )
+
+    def flush(self):
+        # Сброс выполняется только при закрытии
+        pass
+
+    def close(self):
+        self.acquire()
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+        super().close()
+
+
+class ExpoStream:
+    """Поток экспоненциально распределённых случайных чисел.
+
+    Числа генерируются NumPy сразу блоками по `chunk` штук
+    и выдаются по одному при каждом вызове экземпляра.
+    Так накладные расходы Python-вызова генератора
+    распределяются на весь блок.
+
+    # Поля
+
+    * rng: генератор псевдослучайных чисел NumPy
+    * scale: среднее значение (1 / rate)
+    * chunk: размер блока, которым поток пополняется
+    * buf: текущий блок чисел
+    * i: индекс следующего числа в блоке
+    """
+
+    __slots__ = ("rng", "scale", "chunk", "buf", "i")
+
+    def __init__(self,
+                 rng: np.random.Generator,
+                 rate: float,
+                 chunk: int = 65536):
+        self.rng = rng
+        self.scale = 1 / rate
+        self.chunk = chunk
+        # Первый же вызов заполнит блок
+        self.buf: list[float] = []
+        self.i = 0
+
+    def __call__(self) -> float:
+        if self.i == len(self.buf):
+            # tolist() даёт обычные float, индексирование которых
+            # дешевле, чем создание скаляров NumPy
+            self.buf = self.rng.exponential(self.scale, self.chunk).tolist()
+            self.i = 0
+        x = self.buf[self.i]
+        self.i += 1
+        return x
+
+    def prefill(self, n: int):
+        """Заранее сгенерировать блок из `n` чисел.
+
+        Размер последующих блоков не меняется: когда
+        этот блок будет исчерпан, поток пополнится
+        обычным блоком из `chunk` чисел.
+        """
+        self.buf = self.rng.exponential(self.scale, n).tolist()
+        self.i = 0
 
 
 class Client:
@@ -10,20 +105,34 @@ class Client:
 
     * av_wait_time: среднее время ожидания (терпение)
     * av_service_time: среднее время обслуживания
+    * wait_rate: интенсивность ухода клиента (1 / av_wait_time)
+    * service_rate: интенсивность обслуживания (1 / av_service_time)
     * env: экземпляр среды SimPy
     * cid: индивидуальный номер
+    * bank: банк, в котором клиент ожидает обслуживания
     * arrive_time: время прихода
     * satisfied: удовлетворён ли клиент
     * waiting_time: итоговое время ожидания
     * total_time: общее время, проведённое в банке
     """
-    
+
+    # Фиксированный набор полей вместо словаря __dict__
+    # у каждого из множества экземпляров клиентов
+    __slots__ = (
+        "env", "cid", "bank",
+        "arrive_time", "satisfied", "waiting_time", "total_time"
+    )
+
     av_wait_time = 15/60
     av_service_time = 10/60
+    # Параметры экспоненциального распределения вычисляем один раз
+    wait_rate = 1 / av_wait_time
+    service_rate = 1 / av_service_time
 
-    def __init__(self, env: sim.Environment, cid: int):
+    def __init__(self, env: sim.Environment, cid: int, bank: "Bank"):
         self.env = env
         self.cid = cid
+        self.bank = bank
 
         self.arrive_time = env.now
         self.satisfied = False
@@ -37,41 +146,54 @@ class Client:
         """
         # Запрашиваем ресурс
         with workers.get() as worker_req:
-            dt_patience = rand.expovariate(1 / self.av_wait_time)
-            patience = self.env.timeout(dt_patience)
-            # Ожидаем либо освобождения сотрудника, либо конца терпения
-            worker_or_patience = yield worker_req | patience
+            # Если свободный сотрудник есть прямо сейчас,
+            # запрос удовлетворяется сразу же.
+            # Тогда событие "конец терпения" не создаём вовсе.
+            # Отменить запланированный Timeout в SimPy нельзя,
+            # поэтому у клиента, дождавшегося сотрудника раньше
+            # конца терпения, его Timeout по-прежнему остаётся
+            # в очереди событий до своего срока
+            if worker_req.triggered:
+                served = True
+            else:
+                dt_patience = self.bank.patience()
+                patience = self.env.timeout(dt_patience)
+                # Ожидаем либо освобождения сотрудника,
+                # либо конца терпения
+                worker_or_patience = yield AnyOf(
+                    self.env, (worker_req, patience)
+                )
+                served = worker_req in worker_or_patience
 
             # Запоминаем итоговое время ожидания
             self.waiting_time = self.env.now - self.arrive_time
+            self.bank.waiting_times.append(self.waiting_time)
 
             # Если нашёлся свободный сотрудник:
-            if worker_req in worker_or_patience:
+            if served:
                 # - достаём экземпляр работника
                 worker = worker_req.value
-                logging.info(
-                    f"{self.env.now:.4f}: "
-                    f"Worker #{worker.wid} STARTS service "
-                    f"the Client #{self.cid}"
+                _log_info(
+                    "%.4f: Worker #%d STARTS service the Client #%d",
+                    self.env.now, worker.wid, self.cid
                 )
 
                 # - клиент ожидает завершения процесса своего обслуживания
                 yield self.env.process(worker.service(self))
-                logging.info(
-                    f"{self.env.now:.4f}: "
-                    f"Worker #{worker.wid} ENDS service "
-                    f"the Client #{self.cid}"
+                _log_info(
+                    "%.4f: Worker #%d ENDS service the Client #%d",
+                    self.env.now, worker.wid, self.cid
                 )
                 # - клиент удовлетворён
                 self.satisfied = True
                 # - запоминаем общее время, которое клиент провёл в банке
                 self.total_time = self.env.now - self.arrive_time
+                # - обновляем накопленную статистику банка
+                self.bank.total_times.append(self.total_time)
             # Иначе:
             else:
                 # - необслуженный клиент уходит из банка
-                logging.info(
-                    f"{self.env.now:.4f}: Client #{self.cid} is GONE"
-                )
+                _log_info("%.4f: Client #%d is GONE", self.env.now, self.cid)
 
 
 class Worker:
@@ -83,11 +205,15 @@ class Worker:
     * wid: индивидуальный номер работника
     * timed_agenda: расписание работы
     * when_end: когда ближайший перерыв
-    * clients: список обслуженных клиентов
-    * start_event: событие "сотрудник приступил к работе"
-    * get_free_event: событие "сотрудник освободился"
+    * clients: номера обслуженных клиентов
+    * free_store: ресурс свободных сотрудников банка
+      (назначается банком при его создании)
     """
 
+    __slots__ = (
+        "env", "wid", "timed_agenda", "when_end", "clients", "free_store"
+    )
+
     def __init__(self,
                  env: sim.Environment,
                  wid: int,
@@ -97,59 +223,55 @@ class Worker:
         self.timed_agenda = timed_agenda
 
         self.when_end: float = None
-        self.clients = []
-        
-        # Инициализируем элементарные события sim.Event().
-        # Их смысл раскрывается в процессах work, service и
-        # в процессах банка _add_workers и _free_workers
-        self.start_event = env.event()
-        self.get_free_event = env.event()
+        # Храним только номера клиентов, не удерживая
+        # в памяти сами экземпляры Client
+        self.clients = array("L")
+        # Ресурс свободных сотрудников, в который работник
+        # сам себя помещает, когда готов обслуживать клиентов.
+        # Назначается банком в Bank.__init__
+        self.free_store: sim.Store = None
     
     def work(self):
         """Процесс работы сотрудника.
         """
         # Код аналогичен коду работы почтовых окон
         # из предыдущего раздела
+        env = self.env
         for ts, te in self.timed_agenda:
             self.when_end = te
             
-            # Ожидаем начала работы
-            yield self.env.timeout(ts - self.env.now)
-            logging.info(
-                f"{self.env.now:.4f}: Worker #{self.wid} WORKS"
-            )
-
-            # Особенность: активируем событие "сотрудник начал работу",
-            # причём в качестве параметра succeed передаём
-            # текущий экземпляр self, что позволяет процессам
-            # обмениваться данными - переданный экземпляр является
-            # возвращаемым значением при наступлении события
-            self.start_event.succeed(self)
-            # И сразу создаём новое событие,
-            # ведь работник может уйти на перерыв, после которого
-            # снова возобновит работу
-            self.start_event = self.env.event()
+            # Ожидаем начала работы, если оно ещё не наступило
+            dt = ts - env.now
+            if dt > 0:
+                yield env.timeout(dt)
+            _log_info("%.4f: Worker #%d WORKS", env.now, self.wid)
+
+            # Сотрудник начал работу: помещаем его в ресурс
+            # свободных сотрудников, откуда его заберёт клиент.
+            # Экземпляр self станет значением запроса workers.get()
+            # в процессе клиента
+            yield self.free_store.put(self)
 
     def service(self, client: Client):
         """Процесс обслуживания клиента `client`.
         """
-        dt = rand.expovariate(1/client.av_service_time)
+        env = self.env
+        dt = client.bank.service_times()
 
         # Обслуживаем клиента
-        yield self.env.timeout(dt)
-        # Добавляем в собственный список обслуженных клиентов
-        self.clients.append(client)
+        yield env.timeout(dt)
+        # Запоминаем номер обслуженного клиента
+        self.clients.append(client.cid)
 
         if env.now < self.when_end:
-            # Работник продолжает работать,
-            # активируя событие "сотрудник освободился"
-            self.get_free_event.succeed(self)
-            self.get_free_event = self.env.event()
+            # Работник продолжает работать
+            # и возвращается в ресурс свободных сотрудников.
+            # Запрос не ожидаем: клиент, ожидающий окончания
+            # процесса service, уже обслужен
+            self.free_store.put(self)
         else:
             # Работник уходит на перерыв
-            logging.info(
-                f"{self.env.now:.4f}: Worker #{self.wid} RELAXES"
-            )
+            _log_info("%.4f: Worker #%d RELAXES", env.now, self.wid)
 
 
 class Bank:
@@ -159,86 +281,105 @@ class Bank:
     # Поля
 
     * av_incoming_time: среднее  время между приходом клиентов
+    * incoming_rate: интенсивность прихода клиентов (1 / av_incoming_time)
     * env: SimPy-среда
-    * workers_list: простой список сотрудников
+    * workers_list: кортеж всех сотрудников (не меняется после создания)
     * workers: разделяемый ресурс - работающие сотрудники
     * clients: список всех клиентов (обслуженных и нет) банка
+    * arrivals: поток интервалов между приходами клиентов
+    * patience: поток времён терпения клиентов
+    * service_times: поток времён обслуживания клиентов
+    * waiting_times: времена ожидания клиентов, дождавшихся
+      сотрудника или ушедших
+    * total_times: времена нахождения в банке удовлетворённых клиентов
+      (их число равно числу удовлетворённых клиентов)
     """
 
+    __slots__ = (
+        "env", "workers_list", "workers", "clients",
+        "arrivals", "patience", "service_times",
+        "waiting_times", "total_times"
+    )
+
     av_incoming_time = 6/60
+    incoming_rate = 1 / av_incoming_time
 
-    def __init__(self, env: sim.Environment, workers: list[Worker]):
+    def __init__(self,
+                 env: sim.Environment,
+                 workers: list[Worker],
+                 rng: np.random.Generator):
         self.env = env
         
-        self.workers_list = workers.copy()
+        self.workers_list = tuple(workers)
         # Ёмкость ресурса ограничена числом работников.
         # Ресурс изначально пуст.
         # Работники будут добавляться при начале работы
         # по своему расписанию
         self.workers = sim.Store(env, len(workers))
+        for w in self.workers_list:
+            w.free_store = self.workers
         self.clients: list[Client] = []
-
-    def operate(self):
+        # Потоки случайных чисел для каждого из распределений
+        self.arrivals = ExpoStream(rng, Bank.incoming_rate)
+        self.patience = ExpoStream(rng, Client.wait_rate)
+        self.service_times = ExpoStream(rng, Client.service_rate)
+        # Статистика накапливается клиентами по ходу моделирования,
+        # чтобы не перебирать весь список clients при её запросе.
+        # Времена храним в компактных массивах чисел double,
+        # суммирование которых выполняется на уровне C
+        self.waiting_times = array("d")
+        self.total_times = array("d")
+
+    def operate(self, t_sim: float = None):
         """Основной процесс функционирования банка.
 
-        Банк запускает процессы работы своих сотрудников,
-        а также процессы управления сотрудниками
+        Банк запускает процессы работы своих сотрудников
         и процесс генерации новых клиентов.
+        Сотрудники сами помещают себя в ресурс свободных
+        сотрудников `workers`, поэтому отдельные процессы
+        управления ими не нужны.
+
+        * t_sim: ожидаемая длительность моделирования;
+          если задана, случайные числа генерируются заранее
+          одним блоком на всё моделирование
         """
+        if t_sim is not None:
+            # Число клиентов за время t_sim в среднем равно
+            # incoming_rate * t_sim; берём с запасом.
+            # Каждому клиенту нужно не более одного времени
+            # терпения и одного времени обслуживания
+            n = max(1, int(1.5 * Bank.incoming_rate * t_sim))
+            for stream in (self.arrivals, self.patience, self.service_times):
+                stream.prefill(n)
         # Запускаем процессы работы всех сотрудников
         for w in self.workers_list:
             self.env.process(w.work())
-        # Запускаем процессы управления работниками
-        self.env.process(self._add_workers())
-        self.env.process(self._free_workers())
         # Запускаем процесс генерации новых клиентов
         self.env.process(self._clients_incoming())
     
-    def _add_workers(self):
-        # Процесс, добавляющий работников в ресурс workers
-        while True:
-            # Формируем список событий по всем работникам
-            starts = [w.start_event for w in self.workers_list]
-            # Ожидаем наступления хотя бы одного события
-            any_of = yield self.env.any_of(starts)
-            # any_of есть обычный Python-словарь {событие: значение}
-            for worker in any_of.values():
-                # Добавляем сотрудников, начавших работать,
-                # в очередь (ресурс) свободных сотрудников workers
-                yield self.workers.put(worker)
-    
-    def _free_workers(self):
-        # Процесс, добавляющий работников,
-        # обслуживших очередного клиента,
-        # в ресурс свободных сотрудников workers
-        while True:
-            # Код аналогичен _add_workers,
-            # только событие другое (get_free_event)
-            ends = [w.get_free_event for w in self.workers_list]
-            any_of = yield self.env.any_of(ends)
-            for worker in any_of.values():
-                yield self.workers.put(worker)
-    
     def _clients_incoming(self):
-        # Процесс, генерирующий новых клиентов
+        # Процесс, генерирующий новых клиентов.
+        # Всё, что используется на каждой итерации,
+        # заранее связываем с локальными именами
+        env = self.env
+        process = env.process
+        timeout = env.timeout
+        clients_append = self.clients.append
+        workers = self.workers
+        arrivals = self.arrivals
+
         num = 1
         while True:
             # Ожидаем события "пришёл новый клиент"
-            yield self.env.timeout(
-                rand.expovariate(1/self.av_incoming_time)
-            )
-            client = Client(self.env, cid=num)
-            logging.info(
-                f"{self.env.now:.4f}: Client #{client.cid} ARRIVES"
-            )
+            yield timeout(arrivals())
+            client = Client(env, num, self)
+            _log_info("%.4f: Client #%d ARRIVES", env.now, num)
 
             # Запускаем процесс клиента по ожиданию сотрудника
-            self.env.process(
-                client.get_service(self.workers)
-            )
+            process(client.get_service(workers))
 
             # Добавляем клиента в список всех клиентов банка
-            self.clients.append(client)
+            clients_append(client)
             num += 1
 
     # Далее идёт блок обычных методов класса,
@@ -252,32 +393,40 @@ class Bank:
     def get_number_of_satisfied_clients(self):
         """Каково количество довольных клиентов?
         """
-        return len([c for c in self.clients if c.satisfied])
+        return len(self.total_times)
     
     def get_number_of_unsatisfied_clients(self):
         """Каково количество недовольных клиентов?
         """
-        return len(self.clients) - self.get_number_of_satisfied_clients()
+        return len(self.clients) - len(self.total_times)
 
     def get_average_waiting_time(self):
         """Каково среднее время ожидания по всем клиентам?
         """
-        return sum([c.waiting_time for c in self.clients]) / len(self.clients)
+        # Клиенты, ещё ожидающие в конце моделирования,
+        # входят в среднее с нулевым временем ожидания
+        return math.fsum(self.waiting_times) / len(self.clients)
     
     def get_average_total_time(self):
         """Каково среднее время нахождения удовлетворённых клиентов в банке?
         """
-        satisfied = [c.total_time for c in self.clients if c.satisfied]
-        return sum(satisfied) / len(satisfied) if satisfied else 0
+        if not self.total_times:
+            return 0
+        return math.fsum(self.total_times) / len(self.total_times)
 
 
 # Глобальная область
 # - настраиваем логирование
 logging.basicConfig(
-    level=logging.INFO, filename="bank.log", filemode="w"
+    level=logging.INFO,
+    format="%(message)s",
+    handlers=[BufferedFileHandler("bank.log")]
 )
-# - задаём затравку для генератора псевдослучайных чисел
-rand.seed(42)
+# - при отключённом уровне INFO не тратим время на вызовы журнала
+if not _LOG.isEnabledFor(logging.INFO):
+    _log_info = _log_nothing
+# - создаём генератор псевдослучайных чисел с заданной затравкой
+rng = np.random.default_rng(42)
 # - инициализируем среду SimPy
 initial_time = 9
 env = sim.Environment(initial_time)
@@ -293,19 +442,20 @@ workers = [
     for i, ta in enumerate(timed_agenda)
 ]
 # - создаём банк
-bank = Bank(env, workers)
-# - запускаем его основной процесс
+bank = Bank(env, workers, rng)
+# - задаём время моделирования
+t_sim = 2
+# - запускаем основной процесс банка
 #   (но моделирование ещё не запущено)
-bank.operate()
+bank.operate(t_sim)
 # - запускаем симуляцию до заданного времени
-t_sim = 2
 env.run(until=initial_time + t_sim)
 
 # - обрабатываем результаты
 for w in workers:
     print(
         f"Работник #{w.wid} обслужил клиентов ",
-        [c.cid for c in w.clients]
+        list(w.clients)
     )
 
 n_clients = bank.get_number_of_clients()
@@ -1,8 +1,15 @@
-import random as rand
+import random
 import simpy as sim
+from simpy.events import AnyOf
 from collections import namedtuple
 
 
+# Собственный генератор псевдослучайных чисел модели
+# и его методы, связанные с именами модуля
+_rng = random.Random()
+_expo = _rng.expovariate
+_uniform = _rng.uniform
+
 # Простая структура данных клиента
 Client = namedtuple("Client", "cid arrival duration")
 
@@ -16,21 +23,29 @@ def clients_arriving(env: sim.Environment,
     * clients: разделяемый ресурс - очередь клиентов
     * mean_arrival: среднее время между приходами клиентов
     """
+    # Используемые в цикле функции и параметры
+    # заранее связываем с локальными именами
+    timeout = env.timeout
+    put = clients.put
+    expo = _expo
+    uniform = _uniform
+    rate = 1 / mean_arrival
+
     # cid - индивидуальный номер клиента
     cid = 1
 
     while True:
         # Ожидаем нового клиента через случайное время
-        yield env.timeout(rand.expovariate(1/mean_arrival))
+        yield timeout(expo(rate))
         # При наступлении события выполняем callback-код:
         # создаём нового клиента
-        new_client = Client(cid, env.now, rand.uniform(1/60, 1/6))
+        new_client = Client(cid, env.now, uniform(1/60, 1/6))
         print(f"{env.now:.4f}: Клиент #{new_client.cid} ПРИШЁЛ")
 
         # Ожидаем возможности добавить клиента в очередь:
         # в данном случае выполняется сразу,
         # поскольку размер очереди не ограничен
-        yield clients.put(new_client)
+        yield put(new_client)
         # После выполняется callback-код
         cid += 1
 
@@ -46,10 +61,14 @@ def window(env: sim.Environment,
     * clients: очередь клиентов (разделяемый ресурс)
     * win_num: номер окошка
     """
+    timeout = env.timeout
+    process = env.process
     # ts, te - время открытия и закрытия окошка
     for ts, te in timed_agenda:
-        # Ожидание открытия окна
-        yield env.timeout(ts - env.now)
+        # Ожидание открытия окна, если оно ещё не наступило
+        dt = ts - env.now
+        if dt > 0:
+            yield timeout(dt)
         print(
             f"{env.now:.4f}: Окно #{win_num} ОТКРЫЛОСЬ"
         )
@@ -57,7 +76,7 @@ def window(env: sim.Environment,
         # Ожидание окончания процесса обслуживания
         # клиентов (очереди clients).
         # Процесс завершится, когда окошко закроется на перерыв
-        yield env.process(service(env, clients, te, win_num))
+        yield process(service(env, clients, te, win_num))
         # Внутри service бесконечный цикл, который прерывается,
         # когда окошко закрывается на перерыв.
         # Это приводит к новой итерации цикла for =>
@@ -78,18 +97,23 @@ def service(env: sim.Environment,
     * when_close: когда окошку закрываться на перерыв
     * win_num: номер обслуживающего окошка
     """
+    get = clients.get
+    timeout = env.timeout
     while True:
+        # Время закрытия проверяем до запроса ресурса:
+        # удовлетворённый запрос уже забрал бы клиента из очереди,
+        # и при закрытии окна клиент был бы потерян
+        dt = when_close - env.now
+        if dt <= 0:
+            # Условие закрытия окна
+            print(f"{env.now:.4f}: Окно #{win_num} ЗАКРЫЛОСЬ")
+            return
         # Запрос на получение ресурса
-        with clients.get() as client_req:
-            dt = when_close - env.now
-            if dt < 0:
-                # Условие закрытия окна
-                print(f"{env.now:.4f}: Окно #{win_num} ЗАКРЫЛОСЬ")
-                return
-            close = env.timeout(dt)
+        with get() as client_req:
+            close = timeout(dt)
             # Ожидаем либо получения ресурса,
             # либо наступления перерыва
-            event = yield client_req | close
+            event = yield AnyOf(env, (client_req, close))
             # В event хранится словарь {событие: значение_события}
 
             # Если получили доступ к ресурсу:
@@ -102,7 +126,7 @@ def service(env: sim.Environment,
                 )
 
                 # - ожидаем, пока клиент обслуживается
-                yield env.timeout(client.duration)
+                yield timeout(client.duration)
                 print(f"{env.now:.4f}: Окно #{win_num} СВОБОДНО")
             else:
                 # - ещё одно условие закрытия окна
@@ -111,7 +135,7 @@ def service(env: sim.Environment,
 
 
 # Затравка для воспроизведения случайных чисел
-rand.seed(42)
+_rng.seed(42)
 # Инициализируем среду SimPy с указанием начального времени
 env = sim.Environment(initial_time=8.5)
 # Назначаем расписание работы трёх окон
@@ -0,0 +1,33 @@
+#!/usr/bin/env sh
+# Запуск модели под PyPy.
+#
+# Модели состоят из генераторов SimPy, обращений к атрибутам
+# и работы со списками - JIT-компилятор PyPy ускоряет именно такой код.
+# Зависимости (simpy, numpy) должны быть установлены для PyPy:
+#
+#   pypy3 -m pip install -r requirements.txt
+#
+# Использование:
+#
+#   ./run_pypy.sh [script.py [args...]]
+#
+# Без аргументов запускается bank.py из каталога этого скрипта.
+# Путь к указанному скрипту отсчитывается от текущего каталога,
+# остальные аргументы передаются ему без изменений.
+#
+# Интерпретатор можно переопределить переменной окружения PYPY.
+PYPY="${PYPY:-pypy3}"
+
+if ! command -v "$PYPY" >/dev/null 2>&1; then
+    echo "Интерпретатор $PYPY не найден" >&2
+    exit 1
+fi
+
+if [ "$#" -eq 0 ]; then
+    cd "$(dirname "$0")" || exit 1
+    set -- bank.py
+fi
+
+script="$1"
+shift
+exec "$PYPY" "$script" "$@"